@@ -118,5 +118,6 @@ def iqr_outlier_detection(arr: Union[list, np.ndarray]) -> np.ndarray:
     return arr[(arr > lower) & (arr < upper)]
 
 
-a = [-6, 0, 1, 2, 4, 5, 5, 6, 7, 100]
-print(iqr_outlier_detection(a))
+if __name__ == "__main__":
+    a = [-6, 0, 1, 2, 4, 5, 5, 6, 7, 100]
+    print(iqr_outlier_detection(a))
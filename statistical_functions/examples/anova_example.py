@@ -26,7 +26,7 @@ print(pd.DataFrame(
 
 print("\n[INFO] Two way ANOVA test")
 data = pd.read_csv("data/atherosclerosis.csv")
-statistic = two_way_anova(data, features=["age", "dose"], target='expr')
+statistic = two_way_anova(data, features=["age", "dose"], target='expr').statistic
 print(statistic.to_string(index=False))
 print()
 
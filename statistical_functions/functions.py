@@ -1,3 +1,4 @@
+from math import fsum, sqrt
 from typing import Tuple
 
 import numpy as np
@@ -19,6 +20,13 @@ def mean(vector: list, ddof: int = None) -> float:
         where:
             x1...xn: vector values
             NO: number of observations
+
+    Note:
+    -----
+    Short lists (less than 64 values) are summed with the exactly rounded `math.fsum`,
+    because converting them to a NumPy array costs more than the sum itself. Long data is
+    summed by NumPy pairwise summation. For the best speed on long data pass a NumPy array,
+    it is used as is without any conversion.
     -----
     Args:
         vector (list): value vector
@@ -27,14 +35,16 @@ def mean(vector: list, ddof: int = None) -> float:
     Returns:
         float: the mean value
     """
-    m = 0
-    if ddof is None:
-        no = len(vector)
+    if isinstance(vector, np.ndarray):
+        arr = vector
+    elif len(vector) < 64:
+        return fsum(vector) / (len(vector) if ddof is None else ddof)
     else:
-        no = ddof
-    for item in vector:
-        m += item
-    return m / no
+        arr = np.asarray(vector, dtype=np.float64)
+
+    if ddof is None:
+        return arr.mean()
+    return arr.sum() / ddof
 
 
 def var(vector: list, ddof: int = None) -> float:
@@ -62,12 +72,18 @@ def var(vector: list, ddof: int = None) -> float:
     Returns:
         float: variance
     """
-    E = mean(vector, ddof=ddof)
+    if ddof is None:
+        no = len(vector)
+    else:
+        no = ddof
+
+    if not isinstance(vector, np.ndarray) and len(vector) < 12:
+        E = fsum(vector) / len(vector)
+        return fsum([(x - E) * (x - E) for x in vector]) / no
 
-    var = []
-    for x in vector:
-        var.append((x - E) ** 2)
-    return mean(var, ddof)
+    arr = np.asarray(vector, dtype=np.float64)
+    d = arr - arr.mean()
+    return d.dot(d) / no
 
 
 def std(vector: list, ddof: int = None) -> float:
@@ -93,7 +109,7 @@ def std(vector: list, ddof: int = None) -> float:
     Returns:
         float: standart deviation value
     """
-    return var(vector, ddof=ddof) ** 0.5
+    return sqrt(var(vector, ddof=ddof))
 
 
 def standard_error(vector: list) -> float:
@@ -351,8 +367,8 @@ def correlation(x: list, y: list, formula: str = "1") -> float:
 
     elif formula == "2":
         cov = sum([(xi - X) * (yi - Y) for xi, yi in zip(x, y)])
-        xvar = sum([(xi - X) ** 2 for xi in x])
-        yvar = sum([(yi - Y) ** 2 for yi in y])
+        xvar = sum(squared([xi - X for xi in x]))
+        yvar = sum(squared([yi - Y for yi in y]))
         sdev = (xvar * yvar) ** 0.5
         return cov / sdev
 
@@ -367,7 +383,7 @@ def squared(a: list) -> list:
     Return the same list with squared values
     Formula: [a[i]**2 for i in a]
     """
-    return [ai ** 2 for ai in a]
+    return [ai * ai for ai in a]
 
 
 def check_for_symmetry(p, h, s, n) -> bool:
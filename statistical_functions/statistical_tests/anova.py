@@ -1,10 +1,7 @@
-import os
-import sys
-sys.path.append(os.getcwd())
-
 from typing import Tuple, NamedTuple
 from scipy.stats import f
-from statistical_functions.functions import *
+from scipy.special import fdtrc
+import numpy as np
 import pandas as pd
 
 
@@ -13,6 +10,14 @@ class OneWayAnovaStatistics(NamedTuple):
     pvalue: float
 
 
+class TwoWayAnovaStatistics(NamedTuple):
+    statistic: pd.DataFrame
+    f_features: list
+    p_features: list
+    f_interaction: float
+    p_interaction: float
+
+
 class GroupStatistic(NamedTuple):
     sum_sq: float or list
     df: int or list
@@ -68,8 +73,11 @@ def one_way_anova(*args: list) -> OneWayAnovaStatistics:
     statistic: (float) statistic F value
     pvalue: (float) pvalue for statistic
     """
-    ssb, df_ssb = SSB(args)
-    ssw, df_ssw = SSW(args)
+    sizes, sums, sums_sq = _group_stats(args)
+    ssb = _ssb(sizes, sums)
+    ssw = _ssw(sizes, sums, sums_sq)
+    df_ssb = len(args) - 1
+    df_ssw = int(sizes.sum()) - len(args)
 
     ssb_div = ssb / df_ssb
     ssw_div = ssw / df_ssw
@@ -80,7 +88,7 @@ def one_way_anova(*args: list) -> OneWayAnovaStatistics:
     return OneWayAnovaStatistics(f_val, p_val)
 
 
-def TSS(vector: list) -> float:
+def TSS(vector: list, mean: float = None) -> float:
     """
     Return total sum of squares
 
@@ -112,6 +120,7 @@ def TSS(vector: list) -> float:
     -----
     Args:
         vector (list): 1D vector.
+        mean (float): precomputed vector mean value, calculated if not passed
 
     -------
     Return:
@@ -120,8 +129,11 @@ def TSS(vector: list) -> float:
         df: int
             The degrees of freedom
     """
-    Y = np.mean(vector)
-    return sum([(yi - Y) ** 2 for yi in vector])
+    a = np.ascontiguousarray(vector, dtype=np.float64)
+    if mean is None:
+        mean = a.mean()
+    d = a - mean
+    return d.dot(d)
 
 
 def SSB(groups: list) -> Tuple[float, int]:
@@ -158,9 +170,9 @@ def SSB(groups: list) -> Tuple[float, int]:
         df: int
             The degrees of freedom
     """
-    X = mean(flatten(groups))
+    sizes, sums, _ = _group_stats(groups)
     df = len(groups) - 1
-    ssb = sum([len(group) * (mean(group) - X) ** 2 for group in groups])
+    ssb = _ssb(sizes, sums)
     return ssb, df
 
 
@@ -199,12 +211,78 @@ def SSW(groups: list) -> Tuple[float, int]:
         df: int
             The degrees of freedom
     """
-    df = sum([len(group) - 1 for group in groups])
-    ssw = sum([TSS(group) for group in groups])
+    sizes, sums, sums_sq = _group_stats(groups)
+    df = int(sizes.sum()) - len(groups)
+    ssw = _ssw(sizes, sums, sums_sq)
     return ssw, df
 
 
-def two_way_anova(data: pd.DataFrame, features: list, target: str) -> pd.DataFrame:
+def _group_stats(groups: list) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return size, sum and sum of squares of every group
+
+    The sums are the sums of deviations from the general mean `Σ(yi - X)` and `Σ((yi - X)^2)`.
+    Shifting by the general mean keeps the `SSW` formula below free of catastrophic cancellation.
+
+    A few groups, or large groups, are reduced one by one, which avoids copying the data
+    into one buffer. Many small groups are packed and reduced at once, which avoids
+    the Python overhead per group.
+    """
+    sizes = np.fromiter((len(group) for group in groups), dtype=np.intp, count=len(groups))
+    if (sizes == 0).any():
+        raise ValueError("All groups must contain at least one observation")
+    if len(groups) <= 4 or sizes.sum() >= 1000 * len(groups):
+        sums, sums_sq = _loop_group_stats(groups, sizes)
+    else:
+        flat, offsets = _pack(groups, sizes)
+        sums, sums_sq = _packed_group_stats(flat, offsets)
+    return sizes, sums, sums_sq
+
+
+def _loop_group_stats(groups: list, sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return sum and sum of squares of deviations from the general mean, group by group"""
+    arrays = [np.asarray(group, dtype=np.float64) for group in groups]
+    X = sum([a.sum() for a in arrays]) / sizes.sum()
+
+    sums = np.empty(len(arrays))
+    sums_sq = np.empty(len(arrays))
+    for i, a in enumerate(arrays):
+        d = a - X
+        sums[i] = d.sum()
+        sums_sq[i] = d.dot(d)
+    return sums, sums_sq
+
+
+def _pack(groups: list, sizes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the groups packed into one contiguous array and the group offsets
+
+    Group `i` is `flat[offsets[i]:offsets[i] + sizes[i]]`. Packing is done once,
+    so the kernels below work on contiguous memory instead of nested Python lists.
+    """
+    offsets = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    flat = np.concatenate([np.asarray(group, dtype=np.float64) for group in groups])
+    return flat, offsets
+
+
+def _packed_group_stats(flat: np.ndarray, offsets: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return sum and sum of squares of deviations from the general mean for every packed group"""
+    d = flat - flat.mean()
+    sums = np.add.reduceat(d, offsets)
+    np.multiply(d, d, out=d)  # square in place, no second temporary array
+    sums_sq = np.add.reduceat(d, offsets)
+    return sums, sums_sq
+
+
+def _ssb(sizes: np.ndarray, sums: np.ndarray) -> float:
+    """Return `SSB = Σ(NO_i * (m_i - X)^2)` from the output of `_group_stats`"""
+    return (sums * sums / sizes).sum()
+
+
+def _ssw(sizes: np.ndarray, sums: np.ndarray, sums_sq: np.ndarray) -> float:
+    """Return `SSW = Σ(TSS(group_i))` from the output of `_group_stats`"""
+    return (sums_sq - sums * sums / sizes).sum()
+
+
+def two_way_anova(data: pd.DataFrame, features: list, target: str) -> TwoWayAnovaStatistics:
     """Return two-way ANOVA result
 
     Info:
@@ -232,16 +310,24 @@ def two_way_anova(data: pd.DataFrame, features: list, target: str) -> pd.DataFra
         target: the target feature we want to explore
 
     Returns:
-        Pandas DataFrame: Statistics about the data
+        statistic (pd.DataFrame): Statistics about the data
+        f_features (list): F value for each feature
+        p_features (list): P value for each feature
+        f_interaction (float): F value of the features interaction
+        p_interaction (float): P value of the features interaction
     """
+    # The deviations from the grand mean and the feature codes are shared by all the sums of squares below
+    deviations = _deviations(data, target)
+    factorized = _factorize(data, features)
+
     # 1. Find the sum of squares for each feature (SSB: Sum of squares between groups)
-    ssb = SSB_Factorial(data, features, target)
+    ssb = SSB_Factorial(data, features, target, deviations, factorized)
 
     # 2. Find the sum of squares within groups SSW (residuals)
-    ssw = SSW_Factorial(data, features, target)
+    ssw = SSW_Factorial(data, features, target, deviations, factorized)
 
     # 3. Calculate total sum of squares
-    ss_total = TSS(data[target].values)
+    ss_total = deviations.dot(deviations)
 
     # 4. Calculate Sum of Squares Interaction
     interactions = interaction(ss_total, ssb, ssw)
@@ -250,15 +336,20 @@ def two_way_anova(data: pd.DataFrame, features: list, target: str) -> pd.DataFra
     f_values = calculate_F_values(ssb, ssw, interactions)
 
     # 6. Calculate P values
-    p_values = calculate_P_values(f_values, ssb, ssw)
+    p_values = calculate_P_values(f_values, ssb, ssw, interactions)
 
     # 7. Group it all together
     statistic = form_statistic(ssb, ssw, interactions, f_values, p_values, features)
 
-    return statistic
+    return TwoWayAnovaStatistics(statistic, f_values[:-1], p_values[:-1], f_values[-1], p_values[-1])
 
 
-def SSB_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStatistic:
+def SSB_Factorial(
+        data: pd.DataFrame,
+        features: list,
+        target: str,
+        deviations: np.ndarray = None,
+        factorized: dict = None) -> GroupStatistic:
     """Return sum of squares, degrees of freedom and mean sum of squares between groups
 
     Info:
@@ -294,6 +385,8 @@ def SSB_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStati
         data (pd.DataFrame): data
         features (list): feature list
         target (str): dependent variable
+        deviations (np.ndarray): precomputed deviations of target from its mean, calculated if not passed
+        factorized (dict): precomputed `pd.factorize` result for each feature, calculated if not passed
 
     Returns:
         GroupStatistic: group statistic
@@ -301,21 +394,20 @@ def SSB_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStati
     features_sum_sq = []
     features_df = []
     features_ms = []
-    GM = np.mean(data[target].values)  # Grand Mean
+    if deviations is None:
+        deviations = _deviations(data, target)
+    if factorized is None:
+        factorized = _factorize(data, features)
 
     # For each feature...
     for feature in features:
-        feature_means = []  # add up the means for each group of feature
-        feature_group = data.groupby(feature)  # group by feature
-        # For each group with feature...
-        for _, feature_df in feature_group:
-            values = feature_df[target]
-            n = values.shape[0]
-            feature_mean = np.mean(values)
-            feature_means.append((n, feature_mean))
-
-        sum_sq = np.sum([n * (fm - GM) ** 2 for n, fm in feature_means])
-        df = data[feature].nunique() - 1
+        codes, n_groups = _group_codes(factorized, [feature])  # group by feature
+        # Sizes and sums of deviations of all groups of feature at once...
+        n, sums, _ = _bincount_stats(codes, n_groups, deviations)
+        feature_means = sums / n  # (fm - GM) for each group
+
+        sum_sq = (n * feature_means * feature_means).sum()
+        df = n_groups - 1
         features_sum_sq.append(sum_sq)
         features_df.append(df)
         features_ms.append(sum_sq / df)
@@ -323,7 +415,12 @@ def SSB_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStati
     return GroupStatistic(features_sum_sq, features_df, features_ms)
 
 
-def SSW_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStatistic:
+def SSW_Factorial(
+        data: pd.DataFrame,
+        features: list,
+        target: str,
+        deviations: np.ndarray = None,
+        factorized: dict = None) -> GroupStatistic:
     """Return sum of squares, degrees of freedom and mean sum of squares within groups
 
     Info:
@@ -360,25 +457,82 @@ def SSW_Factorial(data: pd.DataFrame, features: list, target: str) -> GroupStati
         data (pd.DataFrame): data
         features (list): feature list
         target (str): dependent variable
+        deviations (np.ndarray): precomputed deviations of target from its mean, calculated if not passed
+        factorized (dict): precomputed `pd.factorize` result for each feature, calculated if not passed
 
     Returns:
         GroupStatistic: group statistic
     """
-    groupped = data.groupby(features)
-    ss_resid_list = []
-    df_resid = 0
-    for _, groupped_df in groupped:
-        values = groupped_df[target]
-        group_mean = np.mean(values)
-        ss = np.sum([(vi - group_mean) ** 2 for vi in values])
-        ss_resid_list.append(ss)
-        df_resid += groupped_df.shape[0] - 1
-    ss_resid = np.sum(ss_resid_list)
+    if deviations is None:
+        deviations = _deviations(data, target)
+    if factorized is None:
+        factorized = _factorize(data, features)
+    codes, n_groups = _group_codes(factorized, features)
+    n, sums, sums_sq = _bincount_stats(codes, n_groups, deviations)
+    ss_resid = (sums_sq - sums * sums / n).sum()
+    df_resid = int((n - 1).sum())
     ms_resid = ss_resid / df_resid
 
     return GroupStatistic(ss_resid, df_resid, ms_resid)
 
 
+def _deviations(data: pd.DataFrame, target: str) -> np.ndarray:
+    """Return deviations of target values from their mean (grand mean)"""
+    values = data[target].to_numpy(dtype=np.float64, copy=True)  # own copy, safe to shift in place
+    values -= values.mean()
+    return values
+
+
+def _factorize(data: pd.DataFrame, features: list) -> dict:
+    """Return `pd.factorize` codes and unique values for each feature"""
+    return {feature: pd.factorize(data[feature].to_numpy()) for feature in features}
+
+
+def _group_codes(factorized: dict, features: list) -> Tuple[np.ndarray, int]:
+    """Return the group code of every row and the number of possible groups
+
+    The factorized codes of the features are combined, so every combination
+    of feature values gets its own code. When there are more possible combinations
+    than rows, the codes are renumbered to the combinations that occur. Rows with
+    a missing feature value get the code -1 and are skipped, the same way as
+    `groupby` drops them.
+    """
+    n_rows = factorized[features[0]][0].size
+    codes = np.zeros(n_rows, dtype=np.intp)
+    missing = np.zeros(n_rows, dtype=bool)
+    n_groups = 1
+    for feature in features:
+        feature_codes, uniques = factorized[feature]
+        codes = codes * uniques.size + feature_codes
+        missing |= feature_codes < 0
+        n_groups *= uniques.size
+        if n_groups > n_rows:
+            # Keep only the combinations that occur instead of the whole cross product
+            codes[missing] = 0
+            valid = ~missing
+            occurring, combinations = pd.factorize(codes[valid])
+            codes[valid] = occurring
+            n_groups = combinations.size
+    codes[missing] = -1
+    return codes, n_groups
+
+
+def _bincount_stats(codes: np.ndarray, n_groups: int, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return size, sum and sum of squares of the values for every non-empty group"""
+    values = np.asarray(values, dtype=np.float64)
+    valid = codes >= 0
+    if not valid.all():  # copy only when there are rows to skip
+        codes = codes[valid]
+        values = values[valid]
+
+    n = np.bincount(codes, minlength=n_groups)
+    sums = np.bincount(codes, weights=values, minlength=n_groups)
+    sums_sq = np.bincount(codes, weights=values * values, minlength=n_groups)
+
+    non_empty = n > 0
+    return n[non_empty], sums[non_empty], sums_sq[non_empty]
+
+
 def interaction(total: float, ssb: GroupStatistic, ssw: GroupStatistic) -> GroupStatistic:
     """Return feature interaction statistic
 
@@ -418,7 +572,9 @@ def interaction(total: float, ssb: GroupStatistic, ssw: GroupStatistic) -> Group
         GroupStatistic: interaction sum_sq, df and ms
     """
     ss = total - np.sum(ssb.sum_sq) - ssw.sum_sq
-    df = np.cumprod(ssb.df)[-1]
+    df = 1
+    for feature_df in ssb.df:
+        df *= feature_df
     ms_interaction = ss / df
     return GroupStatistic(ss, df, ms_interaction)
 
@@ -459,7 +615,11 @@ def calculate_F_values(ssb: GroupStatistic, ssw: GroupStatistic, interactions: G
     return [*f_features, f_interaction]
 
 
-def calculate_P_values(f_values: list, ssb: GroupStatistic, ssw: GroupStatistic) -> list:
+def calculate_P_values(
+        f_values: list,
+        ssb: GroupStatistic,
+        ssw: GroupStatistic,
+        interactions: GroupStatistic = None) -> list:
     """Calculate the P value for each feature and interaction F values
 
     Info:
@@ -480,6 +640,10 @@ def calculate_P_values(f_values: list, ssb: GroupStatistic, ssw: GroupStatistic)
     that our result has statistically significant differences. This is what called pvalue and
     if the pvalue <= 0.05, we can assume we have significant sample differences.
 
+    All the P values are calculated with one vectorized `fdtrc` call (the same survival function
+    as `f.sf`, but without the overhead of the scipy distribution object), where each F value
+    gets its own degrees of freedom.
+
     Formula:
     --------
     * `p = f.sf(f_value, ssb, ssw)`
@@ -490,11 +654,22 @@ def calculate_P_values(f_values: list, ssb: GroupStatistic, ssw: GroupStatistic)
         f_values (list): F values list
         ssb (GroupStatistic): SSB statistic
         ssw (GroupStatistic): SSW statistic
+        interactions (GroupStatistic): interaction statistic, if not passed
+            the interaction df is the product of the features df, as in `interaction`
 
     Returns:
         list: P values list
     """
-    return [f.sf(f_value, ssb.df, ssw.df)[-1] for f_value in f_values]
+    if interactions is None:
+        interaction_df = 1
+        for feature_df in ssb.df:
+            interaction_df *= feature_df
+    else:
+        interaction_df = interactions.df
+    df_values = np.asarray([*ssb.df, interaction_df], dtype=np.float64)
+    # A negative F (negative interaction sum of squares) has pvalue 1, as in f.sf, fdtrc would return NaN
+    f_clipped = np.maximum(np.asarray(f_values, dtype=np.float64), 0)
+    return list(fdtrc(df_values, ssw.df, f_clipped))
 
 
 def form_statistic(